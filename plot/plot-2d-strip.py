@@ -1,5 +1,10 @@
 import matplotlib.pyplot as plt
+from matplotlib.collections import PathCollection, PolyCollection
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import IdentityTransform
 import numpy as np
+import io
 import re
 
 # Paste your MiniZinc output here
@@ -41,21 +46,66 @@ dep_info = [[3,8], [22,9], [5,10], [7,11], [19,12], [11,12], [17,13], [9,14], [1
 """
 
 # Parse positions
-splitted = minizinc_output.split("\n")
-positions = re.findall(r'\[(\d+),(\d+)\]', [x for x in splitted if "positions" in x][0])
-sizes = re.findall(r'\[(\d+),(\d+)\]', [x for x in splitted if "sizes" in x][0])
-dep_info = re.findall(r'\[(\d+),(\d+)\]', [x for x in splitted if "dep_info" in x][0]) if "dep_info" in minizinc_output else None
-positions = np.array([(int(x), int(y)) for x, y in positions])
-sizes = np.array([(int(x), int(y)) for x, y in sizes])
-dep_info = np.array([(int(x), int(y)) for x, y in dep_info]) if dep_info is not None else None
+PAIR = re.compile(rb'\[(\d+),(\d+)\]')
+POSITION_DTYPE = [('x', '<i4'), ('y', '<i4')]
+SIZE_DTYPE = [('w', '<i4'), ('h', '<i4')]
+DEP_DTYPE = [('src', '<i4'), ('dst', '<i4')]
+
+
+def parse_pairs(name, text, dtype):
+    """Parse the `name = [[a,b], ...]` section of a MiniZinc output into a structured int array."""
+    section = re.search(rf'{name}\s*=\s*\[(.*?)\]\s*\n', text, re.S)
+    if section is None:
+        return None
+    return np.fromregex(io.BytesIO(section.group(1).encode()), PAIR, dtype=dtype)
+
+
+positions = parse_pairs("positions", minizinc_output, POSITION_DTYPE)
+sizes = parse_pairs("sizes", minizinc_output, SIZE_DTYPE)
+dep_info = parse_pairs("dep_info", minizinc_output, DEP_DTYPE)
+
+# Field views share memory with the parsed arrays, no (N, 2) copies are made
+x, y = positions['x'], positions['y']
+w, h = sizes['w'], sizes['h']
+# Top-right corners, computed once and shared by the vertices and the axis bounds
+x_end = x + w
+y_end = y + h
 
 # Plot
 fig, ax = plt.subplots()
+# Fixed axes placement instead of running tight_layout over every artist
+fig.set_layout_engine("none")
+ax.set_position([0.1, 0.1, 0.85, 0.8])
 # ax.set_yscale("log")
-for (x, y), (w, h) in zip(positions, sizes):
-    rect = plt.Rectangle((x, y), w, h, edgecolor='black', facecolor='skyblue', lw=2)
-    ax.add_patch(rect)
-    ax.text(x + w/2, y + h/2, f"{int(w)}x{int(h)}", ha='center', va='center', fontsize=8)
+# One PolyCollection for all boxes instead of one Rectangle patch per box
+# Vertices are filled in place into a float32 (N, 4, 2) buffer: half the bytes of float64
+verts = np.empty((len(positions), 4, 2), dtype=np.float32)
+verts[:, 0, 0] = x
+verts[:, 0, 1] = y
+verts[:, 1, 0] = x_end
+verts[:, 1, 1] = y
+verts[:, 2, 0] = x_end
+verts[:, 2, 1] = y_end
+verts[:, 3, 0] = x
+verts[:, 3, 1] = y_end
+pc = PolyCollection(verts, edgecolors='black', facecolors='skyblue', linewidths=2)
+ax.add_collection(pc, autolim=False)  # Limits are set explicitly below
+
+# Labels: one cached TextPath per unique "wxh" string, drawn as a PathCollection
+# with one offset per box instead of one ax.text per box
+centers = np.column_stack([x + w / 2, y + h / 2])
+label_groups = {}
+for i, (box_w, box_h) in enumerate(zip(w.tolist(), h.tolist())):
+    label_groups.setdefault(f"{box_w}x{box_h}", []).append(i)
+for label, idx in label_groups.items():
+    path = TextPath((0, 0), label, size=8)
+    bbox = path.get_extents()
+    # Center the glyphs on the offset point (TextPath starts at the baseline)
+    path = Path(path.vertices - [(bbox.x0 + bbox.x1) / 2, (bbox.y0 + bbox.y1) / 2], path.codes)
+    ax.add_collection(PathCollection(
+        [path], sizes=[1], offsets=centers[idx], offset_transform=ax.transData,
+        transform=IdentityTransform(), facecolors='black', edgecolors='none', clip_on=False, zorder=3,
+    ), autolim=False)
 
 # if dep_info is not None:
 #     for idx, (from_i, to_j) in enumerate(dep_info):
@@ -70,12 +120,10 @@ for (x, y), (w, h) in zip(positions, sizes):
 # Display strip bounds
 total_time = int(re.search(r'total_time\s*=\s*(\d+)', minizinc_output).group(1))
 # memsize = 10
-# print(f"Max sizes {(positions+sizes)[:, 0]} {max((positions+sizes)[:, 0])}")
 ax.set_xlim(0, total_time)
-ax.set_ylim(0, max((positions+sizes)[:, 1]))
+ax.set_ylim(0, int(y_end.max()))
 ax.set_xlabel("Time")
 ax.set_ylabel("Memory Space")
 plt.title("2D Strip Packing Memory Layout")
-plt.grid(True)
-plt.tight_layout()
+ax.grid(True, which='major', linestyle='-', linewidth=0.5)
 plt.show()
\ No newline at end of file
@@ -1,4 +1,7 @@
+from collections import defaultdict, deque
+
 import networkx as nx
+import numpy as np
 
 def netron_style_layout_balanced(G, vertical_spacing=100, horizontal_spacing=150):
     """
@@ -15,33 +18,40 @@ def netron_style_layout_balanced(G, vertical_spacing=100, horizontal_spacing=150
     if not nx.is_directed_acyclic_graph(G):
         raise ValueError("Graph must be a DAG")
 
-    # Step 1: Find the longest path ("spine") using dynamic programming
+    # Step 1: Find the longest path ("spine") using dynamic programming, in a single
+    # pass over the nodes in topological order (pulling from the predecessors).
+    # The longest path ending at a node is also its topological layer, so this
+    # gives the depths too.
     top_order = list(nx.topological_sort(G))
-    dist = {node: 0 for node in top_order}
-    pred = {node: None for node in top_order}
-
-    for node in top_order:
-        for succ in G.successors(node):
-            if dist[node] + 1 > dist[succ]:
-                dist[succ] = dist[node] + 1
-                pred[succ] = node
-
-    end_node = max(dist, key=dist.get)
-    spine = []
-    n = end_node
-    while n is not None:
-        spine.append(n)
-        n = pred[n]
-    spine.reverse()
+    _pred = G.predecessors
+    preds_of = {node: list(_pred(node)) for node in top_order}
+    node_idx = {node: i for i, node in enumerate(top_order)}
+
+    dist_list = [0] * len(top_order)
+    pred_list = [-1] * len(top_order)
+    for i, node in enumerate(top_order):
+        best, best_pred = 0, -1
+        for p in preds_of[node]:
+            pi = node_idx[p]
+            d = dist_list[pi] + 1
+            # Ties go to the predecessor first in topological order
+            if d > best or (d == best and pi < best_pred):
+                best, best_pred = d, pi
+        dist_list[i] = best
+        pred_list[i] = best_pred
+    dist = np.array(dist_list, dtype=np.int64)
+    pred = np.array(pred_list, dtype=np.int64)
 
     # Step 2: Assign depth based on topological layer
-    node_depth = {}
-    for node in top_order:
-        preds = list(G.predecessors(node))
-        if not preds:
-            node_depth[node] = 0
-        else:
-            node_depth[node] = max(node_depth[p] + 1 for p in preds)
+    node_depth = dict(zip(top_order, dist.tolist()))
+
+    end = int(dist.argmax())
+    spine = deque()
+    while end != -1:
+        spine.appendleft(top_order[end])
+        end = int(pred[end])
+    spine = list(spine)
+    spine_set = set(spine)
 
     # Step 3: Place spine nodes vertically at x=0
     pos = {}
@@ -50,52 +60,53 @@ def netron_style_layout_balanced(G, vertical_spacing=100, horizontal_spacing=150
         pos[node] = (0, y)
 
     # Step 4: Place side branches to left and right
-    occupied_slots = set()  # (depth, x) tuples to avoid overlaps
+    # One bitmap per depth, slot k * horizontal_spacing stored at index 2k for k >= 0
+    # and at index 2|k| - 1 for k < 0, so the alternating left/right probing order
+    # (-1, +1, -2, +2, ...) is a contiguous run of indices 1, 2, 3, 4, ...
+    max_attempts = 10
+    n_slots = 2 * (max_attempts + 1) + 1  # room for the far-right fallback slot
+    occupied_slots = defaultdict(lambda: bytearray(n_slots))
+    half_spacing = horizontal_spacing / 2
 
     # Pre-fill occupied positions for spine nodes
     for node in spine:
-        x, y = pos[node]
-        depth = node_depth[node]
-        occupied_slots.add((depth, x))
+        occupied_slots[node_depth[node]][0] = 1
 
     for node in top_order:
-        if node in pos:
+        if node in spine_set:
             continue  # already placed on the spine
 
         depth = node_depth[node]
         y = -depth * vertical_spacing
 
         # Heuristic: determine placement side based on predecessors
-        preds = list(G.predecessors(node))
-        pred_xs = [pos[p][0] for p in preds if p in pos]
+        pred_xs = [pos[p][0] for p in preds_of[node] if p in pos]
 
         side = None
         if pred_xs:
             avg_x = sum(pred_xs) / len(pred_xs)
-            if avg_x > horizontal_spacing / 2:
+            if avg_x > half_spacing:
                 side = "right"
-            elif avg_x < -horizontal_spacing / 2:
+            elif avg_x < -half_spacing:
                 side = "left"
 
         # Try to place node on preferred side, or alternate outward from spine
-        max_attempts = 10
-        for i in range(1, max_attempts):
-            if side == "left":
-                x_try = -i * horizontal_spacing
-            elif side == "right":
-                x_try = i * horizontal_spacing
-            else:
-                # If side unclear, try left then right outward from center
-                x_try = (-1)**i * ((i + 1) // 2) * horizontal_spacing
-
-            if (depth, x_try) not in occupied_slots:
-                pos[node] = (x_try, y)
-                occupied_slots.add((depth, x_try))
-                break
+        slots = occupied_slots[depth]
+        if side == "left":
+            i = slots[1:2 * max_attempts - 1:2].find(0) + 1
+            index, x_try = 2 * i - 1, -i * horizontal_spacing
+        elif side == "right":
+            i = slots[2:2 * max_attempts:2].find(0) + 1
+            index, x_try = 2 * i, i * horizontal_spacing
         else:
+            # If side unclear, try left then right outward from center
+            i = slots.find(0, 1, max_attempts)
+            index, x_try = i, (-1)**i * ((i + 1) // 2) * horizontal_spacing
+
+        if i <= 0:
             # Fallback if all slots are taken: place far right
-            fallback_x = (max_attempts + 1) * horizontal_spacing
-            pos[node] = (fallback_x, y)
-            occupied_slots.add((depth, fallback_x))
+            index, x_try = n_slots - 1, (max_attempts + 1) * horizontal_spacing
+        pos[node] = (x_try, y)
+        slots[index] = 1
 
     return pos
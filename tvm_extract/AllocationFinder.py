@@ -11,10 +11,15 @@ from MemBlock import MemBlock
 
 def _buffer_matches_output_shape(buffer: tir.Buffer, output_mb: MemBlock) -> bool:
     """Check if a TIR buffer matches the expected output MemBlock shape."""
+    # Cheap rank and dtype checks first, each int(dim) below is an FFI call
+    shape = buffer.shape
+    if len(shape) != len(output_mb.shape):
+        return False
+    if str(buffer.dtype) != str(output_mb.dtype):
+        return False
     try:
-        buffer_shape = tuple(int(dim) for dim in buffer.shape)
-        return buffer_shape == output_mb.shape and str(buffer.dtype) == str(output_mb.dtype)
-    except:
+        return all(int(dim) == expected for dim, expected in zip(shape, output_mb.shape))
+    except Exception:
         return False
 
 class AllocationFinder(relax.PyExprVisitor):
@@ -29,37 +34,57 @@ class AllocationFinder(relax.PyExprVisitor):
         
         # Core data structures
         self.memblocks: Dict[str, List[MemBlock]] = {}  # function_name -> [MemBlock]
+        self.memblock_ids: Dict[str, Set[str]] = {}  # function_name -> {MemBlock._id}, O(1) duplicate check
+        self.id_to_memblock: Dict[str, MemBlock] = {}  # MemBlock._id -> MemBlock, filled at registration
+        self.memblocks_by_name: Dict[str, Dict[str, MemBlock]] = {}  # function_name -> {MemBlock.name -> MemBlock}, first registered wins
         
         # Identity tracking - the key improvement
-        self.relax_var_to_memblock: Dict[relax.Var, MemBlock] = {}  # Direct var -> MemBlock mapping
+        # Direct var -> MemBlock mapping. Keyed by the Var itself: every field access (binding.var,
+        # Tuple.fields, func.params) builds a fresh Python proxy, so id(var) would never match twice
+        self.relax_var_to_memblock: Dict[relax.Var, MemBlock] = {}
         
         # Track per-context mappings
         self.tir_buffer_to_memblock: Dict[Tuple[tir.Buffer, int], MemBlock] = {}  # (Buffer, context_id) -> MemBlock mapping
+        self.tir_alloc_to_memblock: Dict[tir.Buffer, MemBlock] = {}  # Allocated Buffer -> MemBlock, shared by all contexts
 
         # Call context tracking
-        self.call_tir_contexts: Dict[str, List['CallTirContext']] = {}  # tir_func_name -> [context]
+        self.call_tir_contexts: Dict[str, 'CallTirContexts'] = {}  # tir_func_name -> all its call sites
         
         # For dependency resolution
         self.current_function = None
         
     def add_memblock(self, function_name: str, mb: MemBlock) -> None:
-        """Add a MemBlock to the specified function."""
+        """Add a MemBlock to the specified function, ignoring MemBlocks already registered there."""
+        ids = self.memblock_ids.setdefault(function_name, set())
+        if mb._id in ids:
+            return
         if self.verbose:
             print(f"    [add_mb] adding {function_name}::{mb._id} ({mb.name} : {mb.shape}+{mb.dtype}+{mb.origin})")
         
+        ids.add(mb._id)
         self.memblocks.setdefault(function_name, []).append(mb)
+        self.id_to_memblock[mb._id] = mb
+        self.memblocks_by_name.setdefault(function_name, {}).setdefault(mb.name, mb)
 
     def walk(self):
         """Walk the IR in dependency order: Relax first, then TIR."""
-        # Pass 1: Process all Relax functions to establish the call graph
-        for gv, func in self.mod_.functions.items():
+        # Snapshot the module functions once, partitioned by kind. functions_items() is sorted
+        # by name; functions.items() follows the Map's hash order, which can change between runs
+        # and would reorder self.memblocks, hence the MiniZinc indices.
+        relax_funcs, tir_funcs = [], []
+        for gv, func in self.mod_.functions_items():
             if isinstance(func, relax.Function):
-                self.visit_relax_func(gv.name_hint, func)
+                relax_funcs.append((gv.name_hint, func))
+            elif isinstance(func, tvm.tir.PrimFunc):
+                tir_funcs.append((gv.name_hint, func))
+
+        # Pass 1: Process all Relax functions to establish the call graph
+        for name_hint, func in relax_funcs:
+            self.visit_relax_func(name_hint, func)
         
         # Pass 2: Process TIR functions with full context
-        for gv, func in self.mod_.functions_items():
-            if isinstance(func, tvm.tir.PrimFunc):
-                self.visit_tir_func(gv.name_hint, func)
+        for name_hint, func in tir_funcs:
+            self.visit_tir_func(name_hint, func)
 
     def visit_relax_func(self, name_hint: str, func: relax.Function):
         """Process Relax function - establish primary tensor identities."""
@@ -73,51 +98,62 @@ class AllocationFinder(relax.PyExprVisitor):
             
         # Process function body
         for binding in func.body.blocks[0].bindings:
-            if isinstance(binding.value, relax.Call) and binding.value.op.name == "relax.call_tir":
+            value = binding.value  # Each field access builds a new FFI proxy, read it once
+            if isinstance(value, relax.Call) and value.op.name == "relax.call_tir":
                 self._process_call_tir(name_hint, binding)  # Create output memblock and get context
 
     def _process_call_tir(self, relax_func_name: str, binding):
         """Process a relax.call_tir operation."""
-        tir_func_name = binding.value.args[0].name_hint
-        output_sinfo = binding.value.sinfo_args[0]
-        input_vars = [arg for arg in binding.value.args[1].fields]  # The Tuple of input vars
+        call = binding.value
+        output_var = binding.var
+        tir_func, input_tuple = call.args[0], call.args[1]
+        tir_func_name = tir_func.name_hint
+        output_sinfo = call.sinfo_args[0]
+        input_vars = list(input_tuple.fields)  # The Tuple of input vars
         
         # Create output MemBlock
         output_mb = MemBlock.from_struct_info(
-            str(binding.var),
+            str(output_var),
             output_sinfo,
             origin=f"relax.call_tir.{tir_func_name}"
         )
         self.add_memblock(relax_func_name, output_mb)
-        self.relax_var_to_memblock[binding.var] = output_mb
+        self.relax_var_to_memblock[output_var] = output_mb
 
-        # Store call context for TIR processing
-        context = CallTirContext(
-            tir_func_name=tir_func_name,
-            input_memblocks=[self.relax_var_to_memblock[var] for var in input_vars],
+        # Store call context for TIR processing, one entry per call site of the TIR function
+        contexts = self.call_tir_contexts.get(tir_func_name)
+        if contexts is None:
+            contexts = self.call_tir_contexts[tir_func_name] = CallTirContexts(tir_func_name)
+        var_to_mb = self.relax_var_to_memblock
+        contexts.add(
+            input_memblocks=[var_to_mb[var] for var in input_vars],
             output_memblock=output_mb,
             input_var_names=[str(var) for var in input_vars]
         )
-        
-        # Store multiple contexts per TIR function
-        if tir_func_name not in self.call_tir_contexts:
-            self.call_tir_contexts[tir_func_name] = []
-        self.call_tir_contexts[tir_func_name].append(context)
 
     def visit_tir_func(self, name_hint: str, func: tvm.tir.PrimFunc):
         """Process TIR function using call context.
         Called after visit_relax_func"""
         self.current_function = name_hint
-        if self.verbose:
+        debug = self.verbose  # Hoisted out of the per-context / per-param loops
+        if debug:
             print(f"[visit_tir_func] Visiting {name_hint}")
         
         # Get all call contexts for this TIR function
-        contexts = self.call_tir_contexts.get(name_hint, [])
+        contexts = self.call_tir_contexts.get(name_hint)
+        n_contexts = len(contexts) if contexts else 0
+
+        # Single traversal of the body: every analysis below iterates over these blocks
+        blocks = self._collect_blocks(func.body)
+
+        # Resolve parameter buffers once, they are shared by every context
+        param_buffers = [func.buffer_map.get(param) for param in func.params]
+        if debug:
+            print(f"    [visit_tir_func] func.buffer_map ({type(func.buffer_map)}) : {func.buffer_map}")
         
         if not contexts:
             # Standalone TIR function - create MemBlocks for parameters
-            for param in func.params:
-                buffer = func.buffer_map.get(param)
+            for buffer in param_buffers:
                 if buffer:
                     mb = MemBlock.from_tir_buffer(
                         buffer.name, 
@@ -128,134 +164,173 @@ class AllocationFinder(relax.PyExprVisitor):
                     # Use context_id=0 for standalone functions
                     self.tir_buffer_to_memblock[(buffer, 0)] = mb
         else:
+            # First, determine which parameters are outputs by analyzing the function.
+            # All contexts call the same PrimFunc, so the first output MemBlock is representative.
+            contexts.output_param_indices = self._identify_output_parameters(
+                param_buffers, contexts.output_memblocks[0], blocks)
+            output_param_indices = contexts.output_param_indices
+
             # Process each context separately and create separate mappings
-            for context_idx, context in enumerate(contexts):
-                if self.verbose:
-                    print(f"  [visit_tir_func] Processing context {context_idx + 1}/{len(contexts)} for {name_hint}")
-                
-                # First, determine which parameters are outputs by analyzing the function
-                self._identify_output_parameters(func, context)
+            for context_idx, (input_memblocks, output_memblock) in enumerate(
+                    zip(contexts.input_memblocks, contexts.output_memblocks)):
+                if debug:
+                    print(f"  [visit_tir_func] Processing context {context_idx + 1}/{n_contexts} for {name_hint}")
+                    print(f"    [visit_tir_func] {contexts.print(context_idx)}")
 
                 # Map TIR parameters to existing Relax MemBlocks for this specific context
-                for i, param in enumerate(func.params):
-                    buffer = func.buffer_map.get(param)
-                    if self.verbose:
-                        print(f"    [visit_tir_func] func.buffer_map ({type(func.buffer_map)}) : {func.buffer_map}")
-
+                for i, buffer in enumerate(param_buffers):
                     if buffer:
                         # Create context-specific mapping
                         buffer_key = (buffer, context_idx)
                         
-                        if self.verbose:
-                            print(f"    [visit_tir_func] {context.print()}")
-                        if i in context.output_param_indices:
+                        if i in output_param_indices:
                             # Output parameter - map to the Relax call_tir output MemBlock
-                            self.tir_buffer_to_memblock[buffer_key] = context.output_memblock
-                            if self.verbose:
-                                print(f"    [visit_tir_func] Mapped output buffer {buffer.name} (ctx {context_idx}) to Relax output {context.output_memblock.name}")
-                        elif i < len(context.input_memblocks):
+                            self.tir_buffer_to_memblock[buffer_key] = output_memblock
+                            if debug:
+                                print(f"    [visit_tir_func] Mapped output buffer {buffer.name} (ctx {context_idx}) to Relax output {output_memblock.name}")
+                        elif i < len(input_memblocks):
                             # Input parameter - map to existing input MemBlock
-                            self.tir_buffer_to_memblock[buffer_key] = context.input_memblocks[i]
-                            if self.verbose:
-                                print(f"    [visit_tir_func] Mapped input buffer {buffer.name} (ctx {context_idx}) to Relax input {context.input_memblocks[i].name}")
+                            self.tir_buffer_to_memblock[buffer_key] = input_memblocks[i]
+                            if debug:
+                                print(f"    [visit_tir_func] Mapped input buffer {buffer.name} (ctx {context_idx}) to Relax input {input_memblocks[i].name}")
         
-        # FIXED: Process internal allocations and build dependency graph for each context
-        for context_idx, context in enumerate(contexts if contexts else [None]):
-            self._process_tir_body(name_hint, func.body, context, context_idx)
+        # Process internal allocations and build dependency graph for all contexts
+        self._process_tir_body(name_hint, blocks, list(range(max(1, n_contexts))))
+
+    def _collect_blocks(self, stmt) -> List[tir.Block]:
+        """
+        Collect all tir.Block nodes of a TIR body in pre-order, so that a block comes
+        before the nested blocks that use its alloc_buffers.
+        """
+        blocks = []
+
+        def visit(node):
+            if type(node) is tir.Block:  # Exact type check, Blocks are never subclassed
+                blocks.append(node)
+            return True
+
+        tvm.tir.stmt_functor.pre_order_visit(stmt, visit)
+        return blocks
     
-    def _identify_output_parameters(self, func: tvm.tir.PrimFunc, context: 'CallTirContext'):
+    def _identify_output_parameters(self, param_buffers: List[Optional[tir.Buffer]], output_memblock: MemBlock, blocks: List[tir.Block]) -> Set[int]:
         """
         Identify which TIR function parameters are outputs by analyzing buffer usage.
         In TVM, output parameters are typically those that are written to but not read from.
+        This is a property of the PrimFunc, so it is computed once and shared by its call contexts.
         """
-        param_buffers = [func.buffer_map.get(param) for param in func.params]
+        output_param_indices: Set[int] = set()
+        # Shape check result per parameter index, computed at most once per parameter
+        shape_matches: Dict[int, bool] = {}
         
-        # Analyze all blocks to see which buffers are primarily written to
-        def analyze_buffer_usage(stmt):
-            if isinstance(stmt, tir.Block):
-                written_buffers = {write.buffer for write in stmt.writes}
-                read_buffers = {read.buffer for read in stmt.reads}
-                
-                for i, buffer in enumerate(param_buffers):
-                    if buffer and buffer in written_buffers:
-                        # Check if this buffer is primarily an output
-                        # Heuristic: if it's written to but never read from in this block,
-                        # or if it matches the expected output shape, it's likely an output
-                        if (buffer not in read_buffers or 
-                            _buffer_matches_output_shape(buffer, context.output_memblock)):
-                            context.mark_output_param(i)
-            return True
+        # Parameters not yet known to be outputs. Buffer hashing crosses the FFI, so only
+        # these are looked up, and a block's read set is only built if one of them is written.
+        pending = [(i, buffer) for i, buffer in enumerate(param_buffers) if buffer]
         
-        tvm.tir.stmt_functor.pre_order_visit(func.body, analyze_buffer_usage)
+        # Analyze all blocks to see which buffers are primarily written to
+        for block in blocks:
+            if not pending:
+                break
+            written_buffers = {write.buffer for write in block.writes}
+            written_params = [(i, buffer) for i, buffer in pending if buffer in written_buffers]
+            if not written_params:
+                continue
+            read_buffers = {read.buffer for read in block.reads}
+            
+            for i, buffer in written_params:
+                # Check if this buffer is primarily an output
+                # Heuristic: if it's written to but never read from in this block,
+                # or if it matches the expected output shape, it's likely an output
+                if buffer not in read_buffers:
+                    output_param_indices.add(i)
+                    continue
+                if i not in shape_matches:
+                    shape_matches[i] = _buffer_matches_output_shape(buffer, output_memblock)
+                if shape_matches[i]:
+                    output_param_indices.add(i)
+            pending = [(i, buffer) for i, buffer in pending if i not in output_param_indices]
         
         # Fallback: if no clear outputs identified, assume last parameter is output
-        if not context.output_param_indices and param_buffers:
-            context.mark_output_param(len(param_buffers) - 1)
+        if not output_param_indices and param_buffers:
+            output_param_indices.add(len(param_buffers) - 1)
             if self.verbose:
-                print(f"    [tir] Fallback: assuming last parameter is output")
+                print("    [tir] Fallback: assuming last parameter is output")
+        return output_param_indices
 
-    def _process_tir_body(self, func_name: str, stmt, context: Optional['CallTirContext'], context_idx: int):
-        """Process TIR function body to find allocations and dependencies."""
-        
-        def visit_allocations(node):
-            if isinstance(node, tir.Block):
-                # Process allocated buffers - these are shared across contexts
-                for buf in node.alloc_buffers:
-                    # FIXED: Only create MemBlock once per allocated buffer, not per context
-                    existing_mb = None
-                    for existing_key, mb in self.tir_buffer_to_memblock.items():
-                        if existing_key[0] == buf and mb.origin == f"tir.alloc.{func_name}":
-                            existing_mb = mb
-                            break
-                    
-                    if not existing_mb:
-                        mb = MemBlock.from_tir_buffer(
-                            buf.name, 
-                            buf, 
-                            origin=f"tir.alloc.{func_name}"
-                        )
-                        self.add_memblock(func_name, mb)
-                        # Use context_idx for the key, but the MemBlock is shared conceptually
-                        self.tir_buffer_to_memblock[(buf, context_idx)] = mb
-                    else:
-                        # Reuse existing MemBlock for this context
-                        self.tir_buffer_to_memblock[(buf, context_idx)] = existing_mb
-                
-                # Build dependencies for this specific context
-                self._build_tir_dependencies(node, context_idx)
-            return True
+    def _process_tir_body(self, func_name: str, blocks: List[tir.Block], context_indices: List[int]):
+        """
+        Process the blocks of a TIR function body to find allocations and dependencies.
+        Each block is handled for every call context in turn. Blocks are in pre-order,
+        so a block's alloc_buffers are registered before the nested blocks that read
+        or write them are processed.
+        """
+        origin = f"tir.alloc.{func_name}"
+        # Hoisted out of the per-block loops
+        alloc_to_mb = self.tir_alloc_to_memblock
+        buffer_to_mb = self.tir_buffer_to_memblock
+        add_memblock = self.add_memblock
+        build_dependencies = self._build_tir_dependencies
         
-        tvm.tir.stmt_functor.pre_order_visit(stmt, visit_allocations)
+        for block in blocks:
+            # Process allocated buffers - these are shared across contexts
+            for buf in block.alloc_buffers:
+                # Only create MemBlock once per allocated buffer, not per context
+                mb = alloc_to_mb.get(buf)
+                if mb is None:
+                    mb = MemBlock.from_tir_buffer(
+                        buf.name, 
+                        buf, 
+                        origin=origin
+                    )
+                    add_memblock(func_name, mb)
+                    alloc_to_mb[buf] = mb
+                # Use context_idx for the key, but the MemBlock is shared conceptually
+                for context_idx in context_indices:
+                    buffer_to_mb[(buf, context_idx)] = mb
+            
+            # Build dependencies for each context
+            for context_idx in context_indices:
+                build_dependencies(block, context_idx)
     
     def _build_tir_dependencies(self, block: tir.Block, context_idx: int):
         """Build dependency relationships within a TIR block for a specific context."""
-        # Get MemBlocks for read/write buffers using context-specific keys
-        write_memblocks = []
-        for write in block.writes:
-            mb = self.tir_buffer_to_memblock.get((write.buffer, context_idx))
-            if mb:
-                write_memblocks.append(mb)
-
-        read_memblocks = []
-        for read in block.reads:
-            mb = self.tir_buffer_to_memblock.get((read.buffer, context_idx))
-            if mb:
-                read_memblocks.append(mb)
+        debug = self.verbose  # Called once per block and context, keep the flag local
+        # Get MemBlocks for read/write buffers using context-specific keys.
+        # block.writes / block.reads cross the FFI, read them once.
+        get = self.tir_buffer_to_memblock.get
+        writes, reads = block.writes, block.reads
+        write_memblocks = [mb for mb in (get((w.buffer, context_idx)) for w in writes) if mb is not None]
+        read_memblocks = [mb for mb in (get((r.buffer, context_idx)) for r in reads) if mb is not None]
         
-        if self.verbose:
+        if debug:
             print(f"    [build_tir_dep] ({block.name_hint}) ctx {context_idx} readers {[(x.name, x._id) for x in read_memblocks]} writers {[(x.name, x._id) for x in write_memblocks]}")
-        
-        # Establish dependencies: each write depends on all reads
+        self._link_tir_memblocks(write_memblocks, read_memblocks, context_idx)
+
+    def _link_tir_memblocks(self, write_memblocks: List[MemBlock], read_memblocks: List[MemBlock], context_idx: int):
+        """Make every MemBlock written by a TIR block depend on every MemBlock it reads."""
+        debug = self.verbose
+        # A buffer may appear in several regions of the same block
+        write_memblocks = list(dict.fromkeys(write_memblocks))
+        read_memblocks = list(dict.fromkeys(read_memblocks))
+
+        # Establish dependencies: each write depends on all reads (no self-dependency, no duplicates).
+        # New edges are collected per writer, then per reader, and added with a single extend.
+        # The MemBlock id sets are authoritative for existing edges; both the sets and the lists
+        # are updated here, the same invariant add_dependency keeps.
         for writer in write_memblocks:
-            for reader in read_memblocks:
-                if writer._id != reader._id:  # Don't self-depend
-                    if self.verbose:
-                        print(f"    [_build_tir_dep] ctx {context_idx}: {writer.name}:{writer._id} <-> {reader.name}:{reader._id}")
-                    # Avoid duplicate dependencies
-                    if reader not in writer.depends_on:
-                        writer.depends_on.append(reader)
-                    if writer not in reader.links_to:
-                        reader.links_to.append(writer)
+            known = writer._depends_on_ids
+            new_deps = [reader for reader in read_memblocks
+                        if reader._id != writer._id and reader._id not in known]
+            if debug:
+                for reader in new_deps:
+                    print(f"    [_build_tir_dep] ctx {context_idx}: {writer.name}:{writer._id} <-> {reader.name}:{reader._id}")
+            known.update(reader._id for reader in new_deps)
+            writer.depends_on.extend(new_deps)
+        for reader in read_memblocks:
+            known = reader._links_to_ids
+            new_links = [writer for writer in write_memblocks
+                         if writer._id != reader._id and writer._id not in known]
+            known.update(writer._id for writer in new_links)
+            reader.links_to.extend(new_links)
 
     def print_elements(self):
         """Print all discovered MemBlocks."""
@@ -272,21 +347,30 @@ class AllocationFinder(relax.PyExprVisitor):
             warnings.warn("No memblocks found. Did you call walk()?")
 
 
-class CallTirContext:
-    """Context information for a call_tir operation."""
-    def __init__(self, tir_func_name: str, input_memblocks: List[MemBlock], 
-                 output_memblock: MemBlock, input_var_names: List[str]):
+class CallTirContexts:
+    """
+    Context information for all relax.call_tir call sites of one TIR function.
+    Stored field by field (struct of arrays): entry k of each list describes call site k.
+    """
+    __slots__ = ('tir_func_name', 'input_memblocks', 'output_memblocks', 'input_var_names', 'output_param_indices')
+
+    def __init__(self, tir_func_name: str):
         self.tir_func_name = tir_func_name
-        self.input_memblocks = input_memblocks
-        self.output_memblock = output_memblock
-        self.input_var_names = input_var_names
-        # Track which TIR parameters correspond to outputs
+        self.input_memblocks: List[List[MemBlock]] = []
+        self.output_memblocks: List[MemBlock] = []
+        self.input_var_names: List[List[str]] = []
+        # Track which TIR parameters correspond to outputs (a property of the TIR function)
         self.output_param_indices: Set[int] = set()
-        
-    def mark_output_param(self, param_index: int):
-        """Mark a TIR parameter as an output parameter."""
-        self.output_param_indices.add(param_index)
 
-    def print(self):
+    def __len__(self):
+        return len(self.output_memblocks)
+
+    def add(self, input_memblocks: List[MemBlock], output_memblock: MemBlock, input_var_names: List[str]):
+        """Record one call site."""
+        self.input_memblocks.append(input_memblocks)
+        self.output_memblocks.append(output_memblock)
+        self.input_var_names.append(input_var_names)
+
+    def print(self, context_idx: int):
         """Debug"""
-        return f"Context '{self.tir_func_name}' inputs ({self.input_var_names} -> {self.input_memblocks}) outputs {self.output_memblock} and output_param_indices {self.output_param_indices}"
\ No newline at end of file
+        return f"Context '{self.tir_func_name}' #{context_idx} inputs ({self.input_var_names[context_idx]} -> {self.input_memblocks[context_idx]}) outputs {self.output_memblocks[context_idx]} and output_param_indices {self.output_param_indices}"
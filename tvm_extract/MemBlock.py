@@ -1,16 +1,62 @@
-import hashlib
-import tvm
+import functools
+import itertools
+import math
+import sys
+import zlib
 import numpy as np
-from typing import Tuple, Optional, Sequence, List
-import uuid
+from typing import Tuple, Optional, Sequence, List, TYPE_CHECKING
+
+if TYPE_CHECKING:  # Only needed for annotations, MemBlock itself does not load TVM
+    import tvm
 
 VERBOSE = True
 
+# Canonical shape tuples, shared by all MemBlocks of the same shape. Bounded: once full it is
+# cleared, existing MemBlocks keep their tuples and only lose sharing with later ones
+_SHAPE_POOL = {}
+_SHAPE_POOL_MAX = 4096
+
+# Source of MemBlock._id: unique within the process, cheaper than uuid4
+_next_id = itertools.count()
+
+# Bytes per element of common TVM dtypes, other dtypes fall back to np.dtype
+_DTYPE_ITEMSIZE = {
+    "bool": 1, "int8": 1, "uint8": 1,
+    "int16": 2, "uint16": 2, "float16": 2, "bfloat16": 2,
+    "int32": 4, "uint32": 4, "float32": 4,
+    "int64": 8, "uint64": 8, "float64": 8,
+}
+
+
+def _as_int_shape(shape) -> Tuple[int, ...]:
+    """Convert a TVM shape (Array of IntImm) to a tuple of Python ints."""
+    return tuple(map(int, shape))
+
+
+@functools.lru_cache(maxsize=4096)
+def _crc_hex(key: str) -> str:
+    # Memoized on the built string: shape may arrive as an unhashable list
+    return format(zlib.crc32(key.encode()), "08x")
+
+
+def _short_digest(shape, dtype, origin) -> str:
+    """8 hex char content digest. CRC32: deterministic across runs, not meant to be secure."""
+    return _crc_hex(str(shape) + str(dtype) + str(origin))
+
+
 class MemBlock:
     """
     Abstraction representing a memory-allocated tensor (intermediate, input, or output).
     Holds metadata like shape, dtype, memory size, origin of allocation, and dependency info.
     """
+    # One instance per tensor of the graph, no per-instance __dict__
+    __slots__ = (
+        "name", "shape", "dtype", "_size_bytes", "origin",
+        "depends_on", "links_to", "first_used", "last_used",
+        "_id", "_content_signature_cache", "_depends_on_ids", "_links_to_ids",
+        "_repr_cache",
+    )
+
     def __init__(
             self, 
             name: str, 
@@ -25,37 +71,72 @@ class MemBlock:
             unique_id: str = None
         ):
         self.name = name  # human-readable tensor name (e.g., lv, lv3, pad_temp, etc.)
-        self.shape = tuple(shape)  # tuple of dimensions (e.g., (1, 64, 128, 128))
-        self.dtype = dtype  # data type string (e.g., "float32")
+        shape = tuple(shape)
+        if len(_SHAPE_POOL) >= _SHAPE_POOL_MAX and shape not in _SHAPE_POOL:
+            _SHAPE_POOL.clear()
+        self.shape = _SHAPE_POOL.setdefault(shape, shape)  # tuple of dimensions (e.g., (1, 64, 128, 128))
+        self.dtype = sys.intern(str(dtype))  # data type string (e.g., "float32"), interned
+        # Footprint, computed on first size_bytes access: np.dtype rejects some TVM dtypes
+        # (int4, float8_e4m3fn, float32x4...) and these must not fail at construction
+        self._size_bytes = None
         self.origin = origin  # where the tensor came from (Relax func, TIR PrimFunc, etc.)
-        self.depends_on = depends_on or []  # tensors this MemBlock depends on
-        self.links_to = links_to or []  # tensors that depend on this one
+        self.depends_on = depends_on or []  # tensors this MemBlock depends on (read-only, see add_dependency)
+        self.links_to = links_to or []  # tensors that depend on this one (read-only, see add_dependency)
         self.first_used = first_used  # index/time of first usage (optional for lifetime modeling)
         self.last_used = last_used  # index/time of last usage (optional)
         
         # Identity management: unique per instance, not content-based
-        self._id = unique_id or str(uuid.uuid4())[:8]
+        self._id = unique_id or format(next(_next_id), "08x")
         
-        # Keep a content signature for debugging/logging purposes only
-        self._content_signature = self._compute_content_signature()
+        # Content signature for debugging/logging purposes only, computed on first access
+        self._content_signature_cache = None
+        # (key, text) of the last __repr__, see __repr__ for the key
+        self._repr_cache = None
+
+        # Ids of depends_on / links_to, the authoritative edge membership (O(1) duplicate checks).
+        # Edges must go through add_dependency / remove_dependency, never the lists directly.
+        self._depends_on_ids = {mb._id for mb in self.depends_on}
+        self._links_to_ids = {mb._id for mb in self.links_to}
+
+    @property
+    def _content_signature(self):
+        """Content-based signature, computed lazily (slots rule out functools.cached_property)."""
+        if self._content_signature_cache is None:
+            self._content_signature_cache = self._compute_content_signature()
+        return self._content_signature_cache
 
     def _compute_content_signature(self):
         """Compute a content-based signature for debugging purposes only."""
-        return hashlib.sha1(
-            (str(self.shape) + str(self.dtype) + str(self.origin)).encode()
-        ).hexdigest()[:8]
+        return _short_digest(self.shape, self.dtype, self.origin)
 
     @property
     def size_bytes(self):
-        """Computes total memory usage in bytes."""
-        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+        """Total memory usage in bytes."""
+        if self._size_bytes is None:
+            itemsize = _DTYPE_ITEMSIZE.get(self.dtype)
+            if itemsize is None:
+                itemsize = np.dtype(self.dtype).itemsize
+            self._size_bytes = math.prod(self.shape) * itemsize
+        return self._size_bytes
+
+    @property
+    def depends_on_names(self) -> frozenset:
+        """Names of the direct dependencies. Not cached: depends_on grows during the AllocationFinder walk."""
+        return frozenset(dep.name for dep in self.depends_on)
 
     def __repr__(self):
         global VERBOSE
+        # Keyed on every field shown: name, origin, ... are plain attributes and may be reassigned
+        key = (VERBOSE, self.name, self._id, self.shape, self.dtype, self.size_bytes, self.origin)
+        cached = self._repr_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
         if not VERBOSE:
-            return f"MemBlock({self.name}, shape={self.shape}, dtype={self.dtype}, size={self.size_bytes})"
+            text = f"MemBlock({self.name}, shape={self.shape}, dtype={self.dtype}, size={self.size_bytes})"
         else:
-            return f"MemBlock({self.name}:{self._id}, shape={self.shape}, dtype={self.dtype}, size={self.size_bytes}, origin={self.origin})"
+            text = f"MemBlock({self.name}:{self._id}, shape={self.shape}, dtype={self.dtype}, size={self.size_bytes}, origin={self.origin})"
+        self._repr_cache = (key, text)
+        return text
 
     def __eq__(self, other):
         """Equality based on unique ID, not content."""
@@ -72,16 +153,16 @@ class MemBlock:
         """
         Builds a MemBlock from a TIR Buffer object, extracting shape and dtype.
         """
-        shape = tuple(int(dim) for dim in buffer.shape)
+        shape = _as_int_shape(buffer.shape)
         dtype = buffer.dtype
         return MemBlock(name, shape, dtype, origin=origin, unique_id=unique_id)
 
     @staticmethod
-    def from_struct_info(name: str, sinfo: tvm.relax.struct_info.TensorStructInfo, origin: str = None, unique_id=None):
+    def from_struct_info(name: str, sinfo: "tvm.relax.struct_info.TensorStructInfo", origin: str = None, unique_id=None):
         """
         Builds a MemBlock from a Relax function output var and its StructInfo.
         """
-        shape = tuple(int(s) for s in sinfo.shape)
+        shape = _as_int_shape(sinfo.shape)
         dtype = sinfo.dtype
         return MemBlock(name, shape, dtype, origin=origin, unique_id=unique_id)
 
@@ -93,66 +174,37 @@ class MemBlock:
         """
         import warnings
         warnings.warn("compute_id is deprecated. Use structural identity tracking.", DeprecationWarning)
-        return hashlib.sha1(
-            (str(shape) + str(dtype) + str(origin)).encode()
-        ).hexdigest()[:8]
-
-    @staticmethod
-    def compute_id_from_buffer(buffer, origin=None):
-        """DEPRECATED: Use structural identity tracking instead."""
-        import warnings
-        warnings.warn("compute_id_from_buffer is deprecated.", DeprecationWarning)
-        shape = tuple(int(dim) for dim in buffer.shape)
-        dtype = buffer.dtype
-        return MemBlock.compute_id(shape, dtype, origin=origin)
-
-    @staticmethod
-    def compute_id_from_relax_varbinding(vb: tvm.relax.VarBinding, origin=None):
-        """DEPRECATED: Use structural identity tracking instead."""
-        import warnings
-        warnings.warn("compute_id_from_relax_varbinding is deprecated.", DeprecationWarning)
-        shape = tuple(int(dim) for dim in vb.value.sinfo_args[0].shape)
-        dtype = vb.value.sinfo_args[0].dtype
-        return MemBlock.compute_id(shape, dtype, origin=origin)
-
-    @staticmethod
-    def compute_id_from_relax_sinfo(sinfo: tvm.relax.TensorStructInfo, origin=None):
-        """DEPRECATED: Use structural identity tracking instead."""
-        import warnings
-        warnings.warn("compute_id_from_relax_sinfo is deprecated.", DeprecationWarning)
-        shape = tuple(int(dim) for dim in sinfo.shape)
-        dtype = sinfo.dtype
-        return MemBlock.compute_id(shape, dtype, origin=origin)
+        return _short_digest(shape, dtype, origin)
 
     # Utility methods for dependency management
     def add_dependency(self, other: 'MemBlock'):
         """Add a dependency: this MemBlock depends on 'other'."""
-        if other not in self.depends_on:
+        if other._id not in self._depends_on_ids:
+            self._depends_on_ids.add(other._id)
             self.depends_on.append(other)
-        if self not in other.links_to:
+        if self._id not in other._links_to_ids:
+            other._links_to_ids.add(self._id)
             other.links_to.append(self)
 
     def remove_dependency(self, other: 'MemBlock'):
         """Remove a dependency."""
-        if other in self.depends_on:
+        if other._id in self._depends_on_ids:
+            self._depends_on_ids.discard(other._id)
             self.depends_on.remove(other)
-        if self in other.links_to:
+        if self._id in other._links_to_ids:
+            other._links_to_ids.discard(self._id)
             other.links_to.remove(self)
 
-    def get_all_dependencies(self, visited=None):
-        """Get all transitive dependencies."""
-        if visited is None:
-            visited = set()
-        
-        if self in visited:
-            return set()
-        
-        visited.add(self)
-        deps = set(self.depends_on)
-        
-        for dep in self.depends_on:
-            deps.update(dep.get_all_dependencies(visited))
-        
+    def get_all_dependencies(self):
+        """Get all transitive dependencies (iterative, each MemBlock is expanded once)."""
+        deps = set()
+        stack = list(self.depends_on)
+        while stack:
+            mb = stack.pop()
+            if mb in deps:
+                continue
+            deps.add(mb)
+            stack.extend(mb.depends_on)
         return deps
 
     def is_leaf(self):
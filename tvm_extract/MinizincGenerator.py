@@ -1,99 +1,24 @@
 import os
 import json
 
-from math import ceil
+from math import ceil, prod
+from itertools import chain
 from typing import List
 from AllocationFinder import AllocationFinder
 from MemBlock import MemBlock
 from collections.abc import Iterable
-import numpy as np
 
 
-def write_dzn(dico):
-    total_string = ""
-    for key, elt in dico.items():
-        if isinstance(elt, list):
-            if isinstance(elt[0], Iterable):  # Nested list : 2D array ?
-                arr = "\n    |".join(str(y) for y in elt)
-            else:  # 1D Array
-                arr = ",\n    ".join(str(y) for y in elt)  # Join and indent
-            total_string += f"{key} = [\n    {arr}\n];\n"
-        else:
-            total_string += f"{key} = {elt}\n"
-    return total_string
-
-
-def generate_minizinc_model(alloc_finder: AllocationFinder, export_name="current", export_path="../minizinc/", transfer_fn=lambda x: x) -> str:
-    """
-    Generate a MiniZinc program from AllocationFinder output, modeling 2D strip packing
-    with data dependencies and dynamic lifetimes.
-    """
-    # Define constraints
-    memblocks: List[MemBlock] = []
-    for blocks in alloc_finder.memblocks.values():
-        memblocks.extend(blocks)
-
-    # Data export
-    dzn = {}
-    # Memory Sizes
-    sizeY = [max(1, int(transfer_fn(np.prod(mb.shape)))) for mb in memblocks]
-    sizeY = [ceil(x / min(sizeY)) for x in sizeY]
-    sum_sizey = sum(sizeY)
-    dzn["sizeY"] = sizeY
-
-    # Operation Costs
-    operation_costs = [1 for _ in memblocks]
-    sum_opcost = sum(operation_costs)
-    dzn["op_cost"] = operation_costs
-
-    # Assign indices to memblocks
-    mb_index = {mb._id: i + 1 for i, mb in enumerate(memblocks)}
-    n = len(memblocks)
-
-    # Memory footprint: fixed memory size (in 32-byte units)
-    # sizeY = [max(1, int(np.log2(np.prod(mb.shape)))) for mb in memblocks]
-
-    index_dep_info: List[str] = []
-    # Lifetime constraints
-    lifetime_constraints = []
-    for mb in memblocks:
-        i = mb_index[mb._id]
-
-        for dep in mb.depends_on:
-            j = mb_index[dep._id]
-            # Each jth dependency must remain alive during computation of ith mb
-            lifetime_constraints.append(f"constraint posX[{j}] + sizeX[{j}] >= posX[{i}] + op_cost[{i}];")
-            # the jth dependency must be existing before i is computed
-            lifetime_constraints.append(f"constraint posX[{j}] <= posX[{i}];")
-            index_dep_info.append(f"{j},{i}")  # Dep j -> i for plotting
-
-    dependency_block = "\n".join(lifetime_constraints)
-    index_dep_info[0] = "|" + index_dep_info[0]
-    index_dep_info[-1] += "|"
-    dzn["index_dep_info"] = index_dep_info
-
-    # No too early alloc constraints for nodes with no dependencies (input, params...)
-    # This is only useful to reduce the search space
-    leaf_constraints = []
-    for mb in memblocks:
-        i = mb_index[mb._id]
-        if not mb.depends_on:  # If it depends on nothing (leaf)
-            if len(mb.links_to) > 1:
-                raise NotImplementedError("If links_to several nodes, we need to take the least restrictive constraint")
-            else:
-                j = mb_index[mb.links_to[0]._id]
-                leaf_constraints.append(f"constraint posX[{i}] >= posX[{j}] - 1;")
-    leaf_block = "\n".join(leaf_constraints)
-
-    minizinc_code = f"""
+# MiniZinc model, filled by generate_minizinc_model
+_MZN_TEMPLATE = """
 % Automatically generated MiniZinc model from TVM AllocationFinder
 include "diffn_k.mzn";
 include "alldifferent.mzn";
 
 int: n = {n};
-int: n_dep = {len(index_dep_info)};
-int: memsize = {int(sum_sizey / 2)};
-int: max_time = {3 * n + 3 * sum_opcost};
+int: n_dep = {n_dep};
+int: memsize = {memsize};
+int: max_time = {max_time};
 
 % Sizes
 array[1..n] of var 1..max_time: sizeX;  % Time dimension (lifetime)
@@ -125,13 +50,7 @@ constraint forall(i in 1..n) (
 % Only useful to prune the search space.
 {leaf_block}
 
-% Non-overlapping constraints
-% constraint forall(i, j in 1..n where i < j) (
-%     (posX[i] + sizeX[i] <= posX[j]) \/
-%     (posX[j] + sizeX[j] <= posX[i]) \/
-%     (posY[i] + sizeY[i] <= posY[j]) \/
-%     (posY[j] + sizeY[j] <= posY[i])
-% );
+% Non-overlapping constraints (global constraint, no pairwise disjunctions)
 constraint diffn_k(positions, sizes);
 
 % Total time is the max horizontal usage
@@ -167,12 +86,100 @@ output [
   "]\\n",
 ];
 """
+
+
+def write_dzn(dico):
+    parts = []  # Joined once at the end
+    for key, elt in dico.items():
+        if isinstance(elt, list):
+            if isinstance(elt[0], Iterable):  # Nested list : 2D array ?
+                arr = "\n    |".join(map(str, elt))
+            else:  # 1D Array
+                arr = ",\n    ".join(map(str, elt))  # Join and indent
+            parts.append(f"{key} = [\n    {arr}\n];\n")
+        else:
+            parts.append(f"{key} = {elt}\n")
+    return "".join(parts)
+
+
+def generate_minizinc_model(alloc_finder: AllocationFinder, export_name="current", export_path="../minizinc/", transfer_fn=lambda x: x) -> str:
+    """
+    Generate a MiniZinc program from AllocationFinder output, modeling 2D strip packing
+    with data dependencies and dynamic lifetimes.
+    """
+    # Define constraints
+    memblocks: List[MemBlock] = list(chain.from_iterable(alloc_finder.memblocks.values()))
+
+    # Data export
+    dzn = {}
+    # Memory Sizes
+    sizeY = [max(1, int(transfer_fn(prod(mb.shape)))) for mb in memblocks]
+    sizeY = [ceil(x / min(sizeY)) for x in sizeY]
+    sum_sizey = sum(sizeY)
+    dzn["sizeY"] = sizeY
+
+    # Operation Costs
+    operation_costs = [1 for _ in memblocks]
+    sum_opcost = sum(operation_costs)
+    dzn["op_cost"] = operation_costs
+
+    # Assign indices to memblocks
+    mb_index = {mb._id: i + 1 for i, mb in enumerate(memblocks)}
+    n = len(memblocks)
+
+    # Memory footprint: fixed memory size (in 32-byte units)
+    # sizeY = [max(1, int(log2(prod(mb.shape)))) for mb in memblocks]
+
+    # Dependency edges (i, j): the ith mb depends on the jth one
+    edges = []
+    add_edge = edges.append
+    for mb in memblocks:
+        i = mb_index[mb._id]  # Once per mb, not once per edge
+        for dep in mb.depends_on:
+            add_edge((i, mb_index[dep._id]))
+
+    # Lifetime constraints
+    # Each jth dependency must remain alive during computation of ith mb,
+    # and the jth dependency must be existing before i is computed
+    lifetime_constraints = [
+        f"constraint posX[{j}] + sizeX[{j}] >= posX[{i}] + op_cost[{i}];\nconstraint posX[{j}] <= posX[{i}];"
+        for i, j in edges
+    ]
+    index_dep_info: List[str] = [f"{j},{i}" for i, j in edges]  # Dep j -> i for plotting
+
+    dependency_block = "\n".join(lifetime_constraints)
+    index_dep_info[0] = "|" + index_dep_info[0]
+    index_dep_info[-1] += "|"
+    dzn["index_dep_info"] = index_dep_info
+
+    # No too early alloc constraints for nodes with no dependencies (input, params...)
+    # This is only useful to reduce the search space
+    leaf_constraints = []
+    for mb in memblocks:
+        if not mb.depends_on:  # If it depends on nothing (leaf)
+            i = mb_index[mb._id]
+            links_to = mb.links_to
+            if len(links_to) > 1:
+                raise NotImplementedError("If links_to several nodes, we need to take the least restrictive constraint")
+            else:
+                j = mb_index[links_to[0]._id]
+                leaf_constraints.append(f"constraint posX[{i}] >= posX[{j}] - 1;")
+    leaf_block = "\n".join(leaf_constraints)
+
+    minizinc_code = _MZN_TEMPLATE.format_map({
+        "n": n,
+        "n_dep": len(index_dep_info),
+        "memsize": int(sum_sizey / 2),
+        "max_time": 3 * n + 3 * sum_opcost,
+        "dependency_block": dependency_block,
+        "leaf_block": leaf_block,
+    })
     
-    with open(os.path.join(export_path, f"{export_name}_model.mzn"), "w") as f:
-        f.write(minizinc_code)
+    with open(os.path.join(export_path, f"{export_name}_model.mzn"), "wb") as f:
+        f.write(minizinc_code.encode("utf-8"))
 
     writable_str = write_dzn(dzn)
-    with open(os.path.join(export_path, f"{export_name}_data.dzn"), "w") as f:
-        f.write(writable_str)
+    with open(os.path.join(export_path, f"{export_name}_data.dzn"), "wb") as f:
+        f.write(writable_str.encode("utf-8"))
 
     return minizinc_code
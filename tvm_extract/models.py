@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from tvm import relax
 from AllocationFinder import AllocationFinder
 
@@ -17,8 +19,14 @@ class RelaxMnist(relax.frontend.nn.Module):
         return x
 
 
-def get_relax_mnist():
-    input_shape = (1, 3, 128, 128)
+def get_relax_mnist(input_shape=(1, 3, 128, 128)):
+    # Export + lowering passes run once per input shape. Every call returns the same cached IRModule:
+    # callers must not mutate it (mod[...] = ..., update_func), the edit would leak into later calls
+    return _build_relax_mnist(tuple(input_shape))
+
+
+@lru_cache(maxsize=None)
+def _build_relax_mnist(input_shape):
     rconv_mod, rconv_params = RelaxMnist().export_tvm({"forward": {"x": relax.frontend.nn.spec.Tensor(input_shape, "float32")}})
     
     transforms = [
@@ -1,47 +1,60 @@
 import unittest
-import tvm
-from tvm import relax
-from AllocationFinder import AllocationFinder
 from MemBlock import MemBlock
 
-
-# === Test Network ===
-class RelaxMnist(relax.frontend.nn.Module):
-    def __init__(self):
-        super().__init__()
-        self.conv1 = relax.frontend.nn.Conv2D(3, 32, kernel_size=5, stride=1, padding=2, bias=True)
-        self.relu1 = relax.frontend.nn.ReLU()
-        self.conv2 = relax.frontend.nn.Conv2D(32, 64, kernel_size=5, stride=1, padding=2, bias=True)
-        self.relu2 = relax.frontend.nn.ReLU()
-
-    def forward(self, x):
-        x = self.conv1(x)
-        x = self.relu1(x)
-        x = self.conv2(x)
-        x = self.relu2(x)
-        return x
-
-class AllocationFinderTester(unittest.TestCase):
-    def __init__(self, methodName = "runTest"):
-        super().__init__(methodName)
-        # === 1. Export TVM Module ===
-        input_shape = (1, 3, 128, 128)
+# TVM is only needed by the AllocationFinder tests, the MemBlock tests run without it
+try:
+    import tvm
+    from tvm import relax
+    HAS_TVM = True
+except ImportError:
+    HAS_TVM = False
+
+if HAS_TVM:
+    from AllocationFinder import AllocationFinder
+
+    # === Test Network ===
+    class RelaxMnist(relax.frontend.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.conv1 = relax.frontend.nn.Conv2D(3, 32, kernel_size=5, stride=1, padding=2, bias=True)
+            self.relu1 = relax.frontend.nn.ReLU()
+            self.conv2 = relax.frontend.nn.Conv2D(32, 64, kernel_size=5, stride=1, padding=2, bias=True)
+            self.relu2 = relax.frontend.nn.ReLU()
+
+        def forward(self, x):
+            x = self.conv1(x)
+            x = self.relu1(x)
+            x = self.conv2(x)
+            x = self.relu2(x)
+            return x
+
+    def lower_relax_mnist(input_shape):
+        """Export RelaxMnist for the given input shape and lower it to fused TIR."""
         rconv_mod, __ = RelaxMnist().export_tvm(
             {"forward": {"x": relax.frontend.nn.spec.Tensor(input_shape, "float32")}}
         )
 
-        transforms = [
+        # Single Sequential pass, run by the pass manager without per-pass round trips
+        pipeline = tvm.transform.Sequential([
             relax.transform.LegalizeOps(),
             relax.transform.AnnotateTIROpPattern(),
             relax.transform.FoldConstant(),
             relax.transform.FuseOps(),
             relax.transform.FuseTIR(),
-        ]
-        new_mod = rconv_mod
-        for t in transforms:
-            new_mod = t(new_mod)
+        ])
+        with tvm.transform.PassContext(opt_level=3):
+            return pipeline(rconv_mod)
 
-        self.transformed_mod = new_mod
+
+@unittest.skipUnless(HAS_TVM, "TVM not available")
+class AllocationFinderTester(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # === 1. Export TVM Modules, once for all test methods ===
+        # Names, counts, origins and dependencies do not depend on the spatial size,
+        # so most tests use a tiny input. The full size one only checks shape propagation.
+        cls.transformed_mod = lower_relax_mnist((1, 3, 8, 8))
+        cls.full_size_mod = lower_relax_mnist((1, 3, 128, 128))
 
     def test_alloc_finder_memblocks(self):
         # === 2. Walk AST ===
@@ -50,41 +63,44 @@ class AllocationFinderTester(unittest.TestCase):
 
         # === 3. Check memblock counts ===
         mb = alloc_finder.memblocks
-        self.assertIn("fused_conv2d_add_relu", mb)
-        self.assertIn("fused_conv2d1_add1_relu1", mb)
-        self.assertIn("reshape", mb)
-        self.assertIn("reshape1", mb)
-        self.assertIn("forward", mb)
-
-        self.assertEqual(len(mb["fused_conv2d_add_relu"]), 4)
-        self.assertEqual(len(mb["fused_conv2d1_add1_relu1"]), 4)
-        self.assertEqual(len(mb["reshape"]), 1)
-        self.assertEqual(len(mb["reshape1"]), 1)
-        self.assertEqual(len(mb["forward"]), 9)
-
-        # === 4. Check shape, dtype, and origin for a few specific ones ===
-        fwd = {mbi.name: mbi for mbi in mb["forward"]}
-        self.assertEqual(fwd["x"].shape, (1, 3, 128, 128))
+        expected_counts = {
+            "fused_conv2d_add_relu": 4,
+            "fused_conv2d1_add1_relu1": 4,
+            "reshape": 1,
+            "reshape1": 1,
+            "forward": 9,
+        }
+        # Single check, reporting every missing function at once
+        self.assertEqual(expected_counts.keys() - mb.keys(), set())
+        self.assertEqual({name: len(mb[name]) for name in expected_counts}, expected_counts)
+
+        # === 4. Check dtype and origin for a few specific ones ===
+        fwd = alloc_finder.memblocks_by_name["forward"]
         self.assertEqual(fwd["x"].dtype, "float32")
         self.assertEqual(fwd["x"].origin, "relax.input")
 
         self.assertEqual(fwd["gv"].origin, "relax.call_tir.fused_conv2d1_add1_relu1")
-        self.assertEqual(fwd["gv"].shape, (1, 64, 128, 128))
 
         # === 5. Dependency modeling: gv must depend on lv and lv3 ===
         gv = fwd["gv"]
-        gv_deps = {d.name for d in gv.depends_on}
-        self.assertIn("lv", gv_deps)
-        self.assertIn("lv3", gv_deps)
+        self.assertLessEqual({"lv", "lv3"}, gv.depends_on_names)
 
         # === 6. Transitive backward check: lv3 must
         lv3 = fwd["lv3"]
         self.assertIn(gv, lv3.links_to)
 
+    def test_alloc_finder_shapes(self):
+        alloc_finder = AllocationFinder(self.full_size_mod)
+        alloc_finder.walk()
+
+        # Shapes are propagated from the Relax struct info
+        fwd = alloc_finder.memblocks_by_name["forward"]
+        self.assertEqual(fwd["x"].shape, (1, 3, 128, 128))
+        self.assertEqual(fwd["gv"].shape, (1, 64, 128, 128))
+
 
 class TestMemBlock(unittest.TestCase):
-    def __init__(self, methodName = "runTest"):
-        super().__init__(methodName)
+    def setUp(self):
         self.mb = MemBlock(name="x", shape=(1, 3, 128, 128), dtype="float32", origin="test_origin")
 
     def test_basic_init(self):
@@ -120,6 +136,7 @@ class TestMemBlock(unittest.TestCase):
         id2 = MemBlock.compute_id("a", (1, 2), "float64")
         self.assertNotEqual(id1, id2)
 
+    @unittest.skipUnless(HAS_TVM, "TVM not available")
     def test_from_buffer(self):
         from tvm.tir import decl_buffer
         buf = decl_buffer((16, 16), dtype="float32", name="B")
@@ -129,6 +146,7 @@ class TestMemBlock(unittest.TestCase):
         self.assertEqual(mb.dtype, "float32")
         self.assertEqual(mb.origin, "my_tir_func")
 
+    @unittest.skipUnless(HAS_TVM, "TVM not available")
     def test_from_relax_input_output(self):
         var = relax.Var("x")
         sinfo = relax.TensorStructInfo((1, 3, 128, 128), dtype="float32")
@@ -154,15 +172,18 @@ class TestMemBlock(unittest.TestCase):
         A = MemBlock("A", (1,), "float32")
         B = MemBlock("B", (1,), "float32", depends_on=[A])
         C = MemBlock("C", (1,), "float32", depends_on=[B])
-        visited = []
-
-        def patched_walk(mb):
-            visited.append(mb.name)
-            for d in mb.depends_on:
-                patched_walk(d)
 
-        patched_walk(C)
-        self.assertEqual(visited, ["C", "B", "A"])
+        def walk_iter(root):
+            # Explicit stack, same pre-order as a recursive walk
+            visited, stack = [], [root]
+            while stack:
+                mb = stack.pop()
+                visited.append(mb.name)
+                stack.extend(reversed(mb.depends_on))
+            return visited
+
+        self.assertEqual(walk_iter(C), ["C", "B", "A"])
+        self.assertEqual(C.get_all_dependencies(), {A, B})
 
     def test_repr_verbose(self):
         mb = MemBlock("Z", (2, 2), "float32", origin="test")